@@ -6,13 +6,18 @@ Script to clone the NVDA AT Automation Plugin from the repository.
 import os
 import sys
 import shutil
+import stat
 import tempfile
 import subprocess
 import json
 import requests
 import zipfile
-import io
 import logging
+import ntpath
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 # Set up logging to a file instead of stdout
 logging.basicConfig(
@@ -21,72 +26,279 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Latest upstream release, which may publish a prebuilt .nvda-addon
+RELEASES_API_URL = "https://api.github.com/repos/Prime-Access-Consulting/nvda-at-automation/releases/latest"
+
+# Prefix of the plugin entries inside the downloaded repository archive
+PLUGIN_ARCHIVE_PREFIX = "nvda-at-automation-main/NVDAPlugin/"
+
+# Files that must be present for the plugin to be usable
+REQUIRED_PLUGIN_FILES = (
+    "manifest.ini",
+    "globalPlugins/CommandSocket/__init__.py",
+    "synthDrivers/captureSpeech/__init__.py",
+)
+
+# Buffer size used when streaming archive members to disk
+COPY_BUFSIZE = 1024 * 1024
+
+# Archives larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Extract on a thread pool only when the plugin has more files than this
+PARALLEL_EXTRACT_THRESHOLD = 8
+PARALLEL_EXTRACT_MAX_WORKERS = 8
+
+# Attempts and delay (in seconds) when deleting a locked or read-only file
+RMTREE_RETRIES = 5
+RMTREE_RETRY_DELAY = 0.2
+
+# Workspace directory holding the last downloaded plugin and its ETag
+PLUGIN_CACHE_DIR = ".nvda_plugin_cache"
+
+def _copy_with_buffer(src, dst, buf):
+    """Copy a file object into another, reusing a preallocated buffer."""
+    view = memoryview(buf)
+    while True:
+        n = src.readinto(view)
+        if not n:
+            break
+        dst.write(view[:n])
+
+def _safe_member_path(root, rel):
+    """Resolve an archive member name to a path inside root.
+    
+    Raises:
+        ValueError: If the name is absolute, drive-qualified, or escapes root.
+    """
+    # Archives are built on Windows too, so check for drives the Windows way
+    drive, _ = ntpath.splitdrive(rel)
+    if drive or rel.startswith(("/", "\\")) or os.path.isabs(rel):
+        raise ValueError(f"Refusing to extract absolute archive entry: {rel}")
+    dest = os.path.realpath(os.path.join(root, rel))
+    if os.path.commonpath([root, dest]) != root:
+        raise ValueError(f"Refusing to extract archive entry outside {root}: {rel}")
+    return dest
+
+def _extract_plugin(zip_ref, prefix, nvda_plugin_dir):
+    """Stream the archive entries under prefix straight into nvda_plugin_dir.
+    
+    Files are extracted on a thread pool when there are enough of them to be
+    worth it; zlib releases the GIL while inflating, so decompression and
+    writes of different members overlap.
+    """
+    os.makedirs(nvda_plugin_dir)
+    root = os.path.realpath(nvda_plugin_dir)
+    members = []
+    for info in zip_ref.infolist():
+        if not info.filename.startswith(prefix):
+            continue
+        rel = info.filename[len(prefix):]
+        if not rel:
+            continue
+        dest = _safe_member_path(root, rel)
+        if info.is_dir():
+            os.makedirs(dest, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            members.append((info, dest))
+    
+    # Each worker thread reuses its own copy buffer across files
+    local = threading.local()
+    
+    def extract_one(member):
+        info, dest = member
+        buf = getattr(local, 'buf', None)
+        if buf is None:
+            buf = local.buf = bytearray(COPY_BUFSIZE)
+        with zip_ref.open(info) as zin, open(dest, 'wb', buffering=COPY_BUFSIZE) as out:
+            _copy_with_buffer(zin, out, buf)
+    
+    if len(members) > PARALLEL_EXTRACT_THRESHOLD:
+        max_workers = min(PARALLEL_EXTRACT_MAX_WORKERS, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(extract_one, members))
+    else:
+        for member in members:
+            extract_one(member)
+
+def _extract_response(response, prefix, staging_dir):
+    """Spool a streamed ZIP download and extract the plugin entries under prefix.
+    
+    Returns:
+        str: An error message if the archive lacks required files, otherwise None.
+    """
+    response.raw.decode_content = True
+    # Spool the archive to disk past a small in-memory threshold
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as archive:
+        shutil.copyfileobj(response.raw, archive, length=COPY_BUFSIZE)
+        archive.seek(0)
+        
+        with zipfile.ZipFile(archive) as zip_ref:
+            # Verify the expected structure against the central directory
+            # before writing anything
+            required = {prefix + name for name in REQUIRED_PLUGIN_FILES}
+            missing = required - set(zip_ref.namelist())
+            if missing:
+                return f"Missing in archive: {sorted(missing)}"
+            
+            # Extract only the plugin entries into the staging directory
+            logging.info(f"Extracting plugin to: {staging_dir}")
+            _extract_plugin(zip_ref, prefix, staging_dir)
+    return None
+
+def _find_release_addon_url():
+    """Look up the .nvda-addon asset of the latest upstream release.
+    
+    Returns:
+        str: The asset download URL, or None if there is no usable release.
+    """
+    try:
+        response = requests.get(RELEASES_API_URL, timeout=30)
+        if response.status_code == 404:
+            logging.info("No upstream release found")
+            return None
+        response.raise_for_status()
+        for asset in response.json().get("assets", []):
+            if asset.get("name", "").endswith(".nvda-addon"):
+                return asset["browser_download_url"]
+    except requests.RequestException as e:
+        logging.warning(f"Could not query upstream releases: {e}")
+        return None
+    except (ValueError, AttributeError, KeyError) as e:
+        logging.warning(f"Unexpected upstream release response: {e}")
+        return None
+    logging.info("Latest upstream release has no .nvda-addon asset")
+    return None
+
+def _remove_tree(path):
+    """Remove a directory tree, retrying entries that are read-only or briefly locked.
+    
+    On Windows, antivirus scanners commonly hold freshly written files open
+    for a moment, which makes the first delete attempt fail.
+    """
+    def onerror(func, failed_path, exc_info):
+        for _ in range(RMTREE_RETRIES):
+            try:
+                os.chmod(failed_path, stat.S_IWRITE)
+                func(failed_path)
+                return
+            except FileNotFoundError:
+                return
+            except PermissionError:
+                time.sleep(RMTREE_RETRY_DELAY)
+        logging.warning(f"Could not remove {failed_path}: {exc_info[1]}")
+    
+    shutil.rmtree(path, onerror=onerror)
+
+def _discard_dir(path):
+    """Rename a directory out of the way and delete it on a background thread.
+    
+    The rename is immediate, so the caller can reuse path straight away while
+    the deletion overlaps with the download and extraction.
+    """
+    trash_dir = os.path.join(os.path.dirname(path), f".NVDAPlugin.trash-{uuid.uuid4().hex}")
+    logging.info(f"Discarding directory: {path}")
+    os.replace(path, trash_dir)
+    threading.Thread(target=_remove_tree, args=(trash_dir,)).start()
+
+def _link_or_copy(src, dst):
+    """Hard-link src to dst, copying instead when linking is not possible.
+    
+    A hard link only adds a directory entry, so no file data is moved. The
+    plugin files are never modified in place, so sharing them is safe.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _update_cache(nvda_plugin_dir, cache_dir, etag):
+    """Store a verified plugin tree and its ETag for conditional downloads.
+    
+    Only trees that passed the archive checks are cached, so a cached copy
+    can be reused without verifying it again.
+    """
+    cached_plugin_dir = os.path.join(cache_dir, "NVDAPlugin")
+    if os.path.exists(cached_plugin_dir):
+        _discard_dir(cached_plugin_dir)
+    shutil.copytree(nvda_plugin_dir, cached_plugin_dir, copy_function=_link_or_copy)
+    with open(os.path.join(cache_dir, "etag"), 'w') as f:
+        f.write(etag)
+    logging.info(f"Cached plugin with ETag {etag} in: {cache_dir}")
+
+def _publish_plugin(staging_dir, nvda_plugin_dir):
+    """Move the staged plugin into place, removing any previous copy in the background.
+    
+    Both directories are siblings, so the move is a rename on the same volume
+    rather than a copy of every file.
+    """
+    if os.path.exists(nvda_plugin_dir):
+        _discard_dir(nvda_plugin_dir)
+    logging.info(f"Publishing plugin from {staging_dir} to {nvda_plugin_dir}")
+    os.replace(staging_dir, nvda_plugin_dir)
+
 def clone_nvda_plugin():
     """
     Clone the NVDA AT Automation Plugin from the repository.
     
     Instead of using git clone, which can have permission issues in GitHub Actions,
-    we'll download the repository as a ZIP file and extract it.
+    we'll download the latest released .nvda-addon, or the repository as a ZIP file
+    when there is none, and stream the plugin out of it.
     """
     try:
-        # Create NVDAPlugin directory in current directory
+        # The plugin is assembled in a sibling staging directory and published
+        # with a single rename once it has been verified
         nvda_plugin_dir = os.path.join(os.getcwd(), "NVDAPlugin")
-        if os.path.exists(nvda_plugin_dir):
-            logging.info(f"Removing existing directory: {nvda_plugin_dir}")
-            shutil.rmtree(nvda_plugin_dir)
+        staging_dir = os.path.join(os.path.dirname(nvda_plugin_dir), ".NVDAPlugin.staging")
+        if os.path.exists(staging_dir):
+            _discard_dir(staging_dir)
         
-        # Download the repository as a ZIP file
-        repo_url = "https://github.com/Prime-Access-Consulting/nvda-at-automation/archive/refs/heads/main.zip"
-        logging.info(f"Downloading repository from {repo_url}")
+        # Prefer the released addon package, which contains only the plugin
+        etag = None
+        addon_url = _find_release_addon_url()
+        if addon_url:
+            logging.info(f"Downloading released addon from {addon_url}")
+            with requests.get(addon_url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                error_msg = _extract_response(response, "", staging_dir)
+        else:
+            # Download the repository as a ZIP file, unless the cached copy is current
+            repo_url = "https://github.com/Prime-Access-Consulting/nvda-at-automation/archive/refs/heads/main.zip"
+            cache_dir = os.path.join(os.getcwd(), PLUGIN_CACHE_DIR)
+            cached_plugin_dir = os.path.join(cache_dir, "NVDAPlugin")
+            etag_path = os.path.join(cache_dir, "etag")
+            
+            headers = {}
+            if os.path.isfile(etag_path) and os.path.isdir(cached_plugin_dir):
+                with open(etag_path, 'r') as f:
+                    headers["If-None-Match"] = f.read().strip()
+            
+            logging.info(f"Downloading repository from {repo_url}")
+            with requests.get(repo_url, headers=headers, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                if response.status_code == 304:
+                    logging.info(f"Repository unchanged, reusing cached plugin: {cached_plugin_dir}")
+                    shutil.copytree(cached_plugin_dir, staging_dir, copy_function=_link_or_copy)
+                    error_msg = None
+                else:
+                    etag = response.headers.get("ETag")
+                    error_msg = _extract_response(response, PLUGIN_ARCHIVE_PREFIX, staging_dir)
         
-        response = requests.get(repo_url)
-        if response.status_code != 200:
-            error_msg = f"Failed to download repository: HTTP {response.status_code}"
+        if error_msg:
             logging.error(error_msg)
             return {"success": False, "error": error_msg}
         
-        # Extract the ZIP file
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zip_ref:
-            # Create a temporary directory for extraction
-            temp_dir = tempfile.mkdtemp()
-            logging.info(f"Extracting to temporary directory: {temp_dir}")
-            zip_ref.extractall(temp_dir)
-            
-            # Find the NVDAPlugin directory in the extracted files
-            extracted_dir = os.path.join(temp_dir, "nvda-at-automation-main")
-            source_plugin_dir = os.path.join(extracted_dir, "NVDAPlugin")
-            
-            if not os.path.exists(source_plugin_dir):
-                error_msg = f"NVDAPlugin directory not found in the repository"
-                logging.error(error_msg)
-                return {"success": False, "error": error_msg}
-            
-            # Verify the expected structure
-            required_files = [
-                os.path.join(source_plugin_dir, "manifest.ini"),
-                os.path.join(source_plugin_dir, "globalPlugins", "CommandSocket", "__init__.py"),
-                os.path.join(source_plugin_dir, "synthDrivers", "captureSpeech", "__init__.py")
-            ]
-            
-            for file_path in required_files:
-                if not os.path.exists(file_path):
-                    error_msg = f"Required file not found: {file_path}"
-                    logging.error(error_msg)
-                    return {"success": False, "error": error_msg}
-            
-            # Log the manifest content for debugging
-            manifest_path = os.path.join(source_plugin_dir, "manifest.ini")
-            with open(manifest_path, 'r') as f:
-                manifest_content = f.read()
-                logging.info(f"Manifest content:\n{manifest_content}")
-            
-            # Copy the NVDAPlugin directory
-            logging.info(f"Copying from {source_plugin_dir} to {nvda_plugin_dir}")
-            shutil.copytree(source_plugin_dir, nvda_plugin_dir)
-            
-            # Clean up the temporary directory
-            logging.info(f"Cleaning up temporary directory: {temp_dir}")
-            shutil.rmtree(temp_dir)
+        # Log the manifest content for debugging
+        manifest_path = os.path.join(staging_dir, "manifest.ini")
+        with open(manifest_path, 'r') as f:
+            manifest_content = f.read()
+            logging.info(f"Manifest content:\n{manifest_content}")
+        
+        _publish_plugin(staging_dir, nvda_plugin_dir)
+        
+        if etag:
+            _update_cache(nvda_plugin_dir, cache_dir, etag)
         
         logging.info(f"Successfully downloaded plugin to: {nvda_plugin_dir}")
         return {"success": True, "plugin_dir": nvda_plugin_dir}
@@ -98,4 +310,4 @@ def clone_nvda_plugin():
 if __name__ == "__main__":
     result = clone_nvda_plugin()
     # Only output the JSON result, nothing else
-    print(json.dumps(result)) 
\ No newline at end of file
+    print(json.dumps(result)) 
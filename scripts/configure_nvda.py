@@ -5,13 +5,17 @@ Script to install and configure NVDA with the AT Automation plugin.
 
 import os
 import sys
+import asyncio
 import time
 import subprocess
 import json
 import logging
 import shutil
+import threading
+import uuid
 import ctypes  # For elevation
-from default_ini_content import get_default_ini_content
+from default_ini_content import get_default_ini_bytes
+from nvda_processes import nvda_processes, kill_nvda
 import datetime
 
 # Set up logging to a file instead of stdout
@@ -21,6 +25,123 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Upper bounds (in seconds) for the event-driven waits below
+NVDA_START_TIMEOUT = 2
+PORTABLE_COPY_TIMEOUT = 30
+ELEVATED_PROCESS_TIMEOUT = 30
+POLL_INTERVAL = 0.1
+
+# A portable copy is complete once its tree has not changed for this many
+# seconds; where the tree cannot be watched for changes it is checked every
+# PORTABLE_POLL_INTERVAL seconds instead
+PORTABLE_QUIET_PERIOD = 2
+PORTABLE_POLL_INTERVAL = 1
+
+# Subprocess output is written directly to this file
+COMMAND_LOG_PATH = 'configure_nvda_commands.log'
+_command_log_fh = None
+
+# Reported when the portable copy is attempted without elevation
+ADMIN_REQUIRED_ERROR = "Administrator privileges are required to create a portable copy. Please run this script as an administrator."
+
+# User configuration layout a portable NVDA keeps its settings in
+PORTABLE_SUBDIRS = (
+    os.path.join('userConfig', 'addons'),
+    os.path.join('userConfig', 'profiles'),
+    os.path.join('userConfig', 'speechDicts'),
+)
+
+# Win32 constants and structures used through ctypes
+SW_HIDE = 0
+SEE_MASK_NOCLOSEPROCESS = 0x00000040
+SEE_MASK_NOASYNC = 0x00000100
+WAIT_OBJECT_0 = 0
+WAIT_TIMEOUT = 0x102
+
+class SHELLEXECUTEINFO(ctypes.Structure):
+    _fields_ = [
+        ("cbSize", ctypes.c_ulong),
+        ("fMask", ctypes.c_ulong),
+        ("hwnd", ctypes.c_void_p),
+        ("lpVerb", ctypes.c_wchar_p),
+        ("lpFile", ctypes.c_wchar_p),
+        ("lpParameters", ctypes.c_wchar_p),
+        ("lpDirectory", ctypes.c_wchar_p),
+        ("nShow", ctypes.c_int),
+        ("hInstApp", ctypes.c_void_p),
+        ("lpIDList", ctypes.c_void_p),
+        ("lpClass", ctypes.c_wchar_p),
+        ("hkeyClass", ctypes.c_void_p),
+        ("dwHotKey", ctypes.c_ulong),
+        ("hIcon", ctypes.c_void_p),
+        ("hProcess", ctypes.c_void_p)
+    ]
+
+class OVERLAPPED(ctypes.Structure):
+    _fields_ = [
+        ("Internal", ctypes.c_void_p),
+        ("InternalHigh", ctypes.c_void_p),
+        ("Offset", ctypes.c_ulong),
+        ("OffsetHigh", ctypes.c_ulong),
+        ("hEvent", ctypes.c_void_p)
+    ]
+
+# The DLLs and their prototypes are set up once; both are None off Windows
+if os.name == 'nt':
+    _shell32 = ctypes.windll.shell32
+    _kernel32 = ctypes.windll.kernel32
+    _shell32.ShellExecuteExW.argtypes = [ctypes.POINTER(SHELLEXECUTEINFO)]
+    _kernel32.CreateFileW.restype = ctypes.c_void_p
+    _kernel32.CreateEventW.restype = ctypes.c_void_p
+    _kernel32.ReadDirectoryChangesW.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int,
+        ctypes.c_ulong, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p
+    ]
+    _kernel32.GetOverlappedResult.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int
+    ]
+    _kernel32.CancelIoEx.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    _kernel32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    _kernel32.ResetEvent.argtypes = [ctypes.c_void_p]
+    _kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+    _kernel32.TerminateProcess.argtypes = [ctypes.c_void_p, ctypes.c_uint]
+    _kernel32.GetExitCodeProcess.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    _kernel32.CopyFile2.argtypes = [ctypes.c_wchar_p, ctypes.c_wchar_p, ctypes.c_void_p]
+    _kernel32.CopyFile2.restype = ctypes.c_long  # HRESULT
+else:
+    _shell32 = _kernel32 = None
+
+def _check_admin():
+    """Query the process token for administrator privileges."""
+    try:
+        return bool(_shell32.IsUserAnAdmin())
+    except Exception as e:
+        logging.error("Admin check failed: %s", e)
+        return False
+
+# None of these values can change for the lifetime of the process
+_IS_ADMIN = _check_admin()
+PROGRAM_FILES = os.environ.get('ProgramFiles', 'C:\\Program Files')
+PROGRAM_FILES_X86 = os.environ.get('ProgramFiles(x86)', 'C:\\Program Files (x86)')
+APPDATA = os.environ.get('APPDATA')
+NVDA_CONFIG_DIR = os.path.join(APPDATA, 'nvda') if APPDATA else None
+NVDA_ADDONS_DIR = os.path.join(NVDA_CONFIG_DIR, 'addons') if APPDATA else None
+NVDA_EXE = os.path.join(PROGRAM_FILES_X86, 'NVDA', 'nvda.exe')
+# The environment usually points at the same defaults, so drop duplicates
+NVDA_EXE_CANDIDATES = tuple({
+    os.path.normcase(p): p for p in (
+        os.path.join(PROGRAM_FILES, 'NVDA', 'nvda.exe'),
+        NVDA_EXE,
+        os.path.join('C:\\Program Files', 'NVDA', 'nvda.exe'),
+        os.path.join('C:\\Program Files (x86)', 'NVDA', 'nvda.exe'),
+    )
+}.values())
+
+def _require_appdata():
+    """Raise if APPDATA is unset, since NVDA's user configuration lives there."""
+    if not APPDATA:
+        raise EnvironmentError("APPDATA is not set; cannot locate the NVDA user configuration directory")
+
 def is_admin():
     """
     Check if the script is running with administrator privileges.
@@ -28,97 +149,259 @@ def is_admin():
     Returns:
         bool: True if running as admin, False otherwise.
     """
-    try:
-        return ctypes.windll.shell32.IsUserAnAdmin()
-    except Exception as e:
-        logging.error(f"Admin check failed: {e}")
-        return False
+    return _IS_ADMIN
+
+def _command_log():
+    """Return the unbuffered handle that subprocess output is written to."""
+    global _command_log_fh
+    if _command_log_fh is None:
+        _command_log_fh = open(COMMAND_LOG_PATH, 'ab', buffering=0)
+    return _command_log_fh
 
 def run_command(cmd, shell=False, check=True):
-    """Run a command and log its output without affecting stdout."""
+    """Run a command and log its output without affecting stdout.
+    
+    Synchronous wrapper around run_command_async for callers outside an event loop.
+    """
+    return asyncio.run(run_command_async(cmd, shell=shell, check=check))
+
+async def run_command_async(cmd, shell=False, check=True):
+    """Run a command without blocking the event loop.
+    
+    The command's stdout and stderr are handed the COMMAND_LOG_PATH file
+    handle, so its output reaches the log without passing through Python.
+    
+    Args:
+        cmd (list or str): Executable followed by its arguments, or a command
+            line string when shell is True.
+        shell (bool): Run cmd through the shell.
+        check (bool): Raise CalledProcessError on a non-zero exit code.
+        
+    Returns:
+        subprocess.CompletedProcess: The finished command. Output is not captured.
+    """
+    log_fh = _command_log()
+    log_fh.write(f"\n$ {cmd}\n".encode())
+    if shell:
+        proc = await asyncio.create_subprocess_shell(cmd, stdout=log_fh, stderr=log_fh)
+    else:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=log_fh, stderr=log_fh)
+    returncode = await proc.wait()
+    logging.info("Command executed: %s", cmd)
+    logging.info("Return code: %s", returncode)
+    if check and returncode != 0:
+        e = subprocess.CalledProcessError(returncode, cmd)
+        logging.error("Command failed: %s (output in %s)", e, COMMAND_LOG_PATH)
+        raise e
+    return subprocess.CompletedProcess(cmd, returncode)
+
+def wait_until(predicate, timeout, interval=POLL_INTERVAL):
+    """Poll a predicate until it holds or the timeout expires.
+    
+    Args:
+        predicate (callable): Zero-argument callable returning a truthy value when done.
+        timeout (float): Maximum number of seconds to wait.
+        interval (float): Delay between checks in seconds.
+        
+    Returns:
+        bool: True if the predicate held before the timeout, False otherwise.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if predicate():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+def _tree_snapshot(path):
+    """Return a summary of a directory tree that changes whenever a file in it does.
+    
+    The tree is walked with os.scandir, whose DirEntry.stat() is answered from
+    the directory listing on Windows instead of needing a call per file.
+    """
+    count = size = latest = 0
+    pending = [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    count += 1
+                    size += st.st_size
+                    latest = max(latest, st.st_mtime_ns)
+        except FileNotFoundError:
+            continue
+    return count, size, latest
+
+def _poll_for_portable_copy(portable_path, required, timeout):
+    """Poll for a complete portable copy by comparing tree snapshots."""
+    deadline = time.monotonic() + timeout
+    last_snapshot = None
+    stable_since = None
+    while True:
+        now = time.monotonic()
+        if all(os.path.isfile(os.path.join(portable_path, r)) for r in required):
+            snapshot = _tree_snapshot(portable_path)
+            if snapshot != last_snapshot:
+                last_snapshot, stable_since = snapshot, now
+            elif now - stable_since >= PORTABLE_QUIET_PERIOD:
+                return True
+        if now >= deadline:
+            return False
+        time.sleep(PORTABLE_POLL_INTERVAL)
+
+def wait_for_portable_copy(portable_path, required, timeout):
+    """Wait until NVDA has finished writing a portable copy.
+    
+    NVDA writes nvda.exe early and the rest of the tree after it, so the copy
+    only counts as complete once every required file exists and nothing in
+    the tree has changed for PORTABLE_QUIET_PERIOD seconds.
+    
+    Changes are detected with overlapped ReadDirectoryChangesW on the whole
+    tree, so the quiet period is a single wait on the notification event.
+    Falls back to polling tree snapshots if the directory cannot be watched.
+    
+    Args:
+        portable_path (str): Directory the portable copy is written to.
+        required (list): Paths, relative to portable_path, that must exist.
+        timeout (float): Maximum number of seconds to wait.
+        
+    Returns:
+        bool: True if the copy completed before the timeout, False otherwise.
+    """
+    FILE_LIST_DIRECTORY = 0x0001
+    FILE_SHARE_ALL = 0x00000001 | 0x00000002 | 0x00000004  # READ | WRITE | DELETE
+    OPEN_EXISTING = 3
+    FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+    FILE_FLAG_OVERLAPPED = 0x40000000
+    # FILE_NAME | DIR_NAME | SIZE | LAST_WRITE
+    NOTIFY_FILTER = 0x00000001 | 0x00000002 | 0x00000008 | 0x00000010
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+    
+    def poll():
+        logging.info("Polling for the portable copy in %s", portable_path)
+        return _poll_for_portable_copy(portable_path, required, max(0, deadline - time.monotonic()))
+    
+    deadline = time.monotonic() + timeout
+    if _kernel32 is None:
+        return poll()
+    
+    handle = _kernel32.CreateFileW(
+        portable_path, FILE_LIST_DIRECTORY, FILE_SHARE_ALL, None,
+        OPEN_EXISTING, FILE_FLAG_BACKUP_SEMANTICS | FILE_FLAG_OVERLAPPED, None
+    )
+    if not handle or handle == INVALID_HANDLE_VALUE:
+        return poll()
+    event = _kernel32.CreateEventW(None, True, False, None)
+    
+    # The notifications themselves are not read, only that one arrived
+    buf = ctypes.create_string_buffer(64 * 1024)
+    overlapped = OVERLAPPED()
+    transferred = ctypes.c_ulong()
+    pending = False
     try:
-        result = subprocess.run(
-            cmd, 
-            shell=shell, 
-            check=check,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        logging.info(f"Command executed: {cmd}")
-        logging.info(f"Return code: {result.returncode}")
-        logging.info(f"Output: {result.stdout}")
-        if result.stderr:
-            logging.info(f"Error output: {result.stderr}")
-        return result
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Command failed: {e}")
-        logging.error(f"Output: {e.stdout}")
-        logging.error(f"Error output: {e.stderr}")
-        raise
+        while True:
+            if not pending:
+                _kernel32.ResetEvent(event)
+                overlapped = OVERLAPPED(hEvent=event)
+                if not _kernel32.ReadDirectoryChangesW(
+                    handle, buf, len(buf), True, NOTIFY_FILTER,
+                    None, ctypes.byref(overlapped), None
+                ):
+                    return poll()
+                pending = True
+            
+            # The watch is armed before checking, so no change is missed.
+            # Until the required files exist, wake on any change to look
+            # again; once they do, a full quiet period without a change
+            # means the copy is done
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            complete = all(os.path.isfile(os.path.join(portable_path, r)) for r in required)
+            wait = min(remaining, PORTABLE_QUIET_PERIOD) if complete else remaining
+            if _kernel32.WaitForSingleObject(event, int(wait * 1000)) != WAIT_OBJECT_0:
+                if complete and wait >= PORTABLE_QUIET_PERIOD:
+                    return True
+                continue
+            
+            _kernel32.GetOverlappedResult(handle, ctypes.byref(overlapped), ctypes.byref(transferred), False)
+            pending = False
+    finally:
+        if pending:
+            # Let the cancelled read complete before its buffer is released
+            _kernel32.CancelIoEx(handle, ctypes.byref(overlapped))
+            _kernel32.GetOverlappedResult(handle, ctypes.byref(overlapped), ctypes.byref(transferred), True)
+        _kernel32.CloseHandle(event)
+        _kernel32.CloseHandle(handle)
 
-def run_as_admin(executable, parameters):
+def run_as_admin(cmd, done_path=None):
     """
-    Run a command with elevated privileges using ShellExecuteEx.
+    Run a command with elevated privileges using ShellExecuteExW.
+    
+    If the script is already elevated the command is run directly.
 
     Args:
-        executable (str): Full path to the executable.
-        parameters (str): Command-line arguments.
+        cmd (list): Executable path followed by its arguments.
+        done_path (str, optional): File whose appearance means the elevated
+            process has done its work; stop waiting for it to exit then.
 
     Returns:
-        int: The process's exit code once it finishes.
+        int: The process's exit code once it finishes, or None if done_path
+            appeared while it was still running.
 
     Raises:
         Exception: If the elevated process cannot be started.
     """
-    SW_SHOW = 5
-    SEE_MASK_NOCLOSEPROCESS = 0x00000040
-
-    class SHELLEXECUTEINFO(ctypes.Structure):
-        _fields_ = [
-            ("cbSize", ctypes.c_ulong),
-            ("fMask", ctypes.c_ulong),
-            ("hwnd", ctypes.c_void_p),
-            ("lpVerb", ctypes.c_wchar_p),
-            ("lpFile", ctypes.c_wchar_p),
-            ("lpParameters", ctypes.c_wchar_p),
-            ("lpDirectory", ctypes.c_wchar_p),
-            ("nShow", ctypes.c_int),
-            ("hInstApp", ctypes.c_void_p),
-            ("lpIDList", ctypes.c_void_p),
-            ("lpClass", ctypes.c_wchar_p),
-            ("hkeyClass", ctypes.c_void_p),
-            ("dwHotKey", ctypes.c_ulong),
-            ("hIcon", ctypes.c_void_p),
-            ("hProcess", ctypes.c_void_p)
-        ]
+    if is_admin():
+        logging.info("Already elevated, running directly: %s", cmd)
+        return subprocess.run(cmd).returncode
+    
+    WAIT_SLICE_MS = 500
     
     sei = SHELLEXECUTEINFO()
     sei.cbSize = ctypes.sizeof(SHELLEXECUTEINFO)
-    sei.fMask = SEE_MASK_NOCLOSEPROCESS
+    sei.fMask = SEE_MASK_NOCLOSEPROCESS | SEE_MASK_NOASYNC
     sei.hwnd = None
     sei.lpVerb = "runas"  # Causes UAC elevation prompt if needed
-    sei.lpFile = executable
-    sei.lpParameters = parameters
+    sei.lpFile = cmd[0]
+    sei.lpParameters = subprocess.list2cmdline(cmd[1:])
     sei.lpDirectory = None
-    sei.nShow = SW_SHOW
+    sei.nShow = SW_HIDE
     sei.hInstApp = None
 
-    if not ctypes.windll.shell32.ShellExecuteEx(ctypes.byref(sei)):
-        raise Exception("Failed to execute process with elevated privileges. (ShellExecuteEx failed)")
+    if not _shell32.ShellExecuteExW(ctypes.byref(sei)):
+        raise Exception("Failed to execute process with elevated privileges. (ShellExecuteExW failed)")
     
-    # Wait for the process to finish - 30 seconds timeout (30000 milliseconds)
-    ret = ctypes.windll.kernel32.WaitForSingleObject(sei.hProcess, 30000)
-    if ret == 0x102:  # WAIT_TIMEOUT
-        ctypes.windll.kernel32.TerminateProcess(sei.hProcess, 1)
-        raise Exception("Elevated process timed out and was terminated")
-    
-    # Retrieve exit code
-    exit_code = ctypes.c_ulong()
-    ctypes.windll.kernel32.GetExitCodeProcess(sei.hProcess, ctypes.byref(exit_code))
-    return exit_code.value
+    try:
+        # Wait for the process to finish in short slices, so the work being
+        # done can be noticed before the process exits
+        deadline = time.monotonic() + ELEVATED_PROCESS_TIMEOUT
+        while _kernel32.WaitForSingleObject(sei.hProcess, WAIT_SLICE_MS) == WAIT_TIMEOUT:
+            if done_path and os.path.exists(done_path):
+                logging.info("%s appeared, not waiting for the elevated process", done_path)
+                return None
+            if time.monotonic() >= deadline:
+                # UIPI blocks posting a quit message to an elevated process
+                # from this one, so it can only be terminated
+                _kernel32.TerminateProcess(sei.hProcess, 1)
+                raise Exception("Elevated process timed out and was terminated")
+        
+        # Retrieve exit code
+        exit_code = ctypes.c_ulong()
+        _kernel32.GetExitCodeProcess(sei.hProcess, ctypes.byref(exit_code))
+        return exit_code.value
+    finally:
+        _kernel32.CloseHandle(sei.hProcess)
 
-def install_nvda(installer_path):
+async def install_nvda(installer_path):
     """Install NVDA silently.
     
     Args:
@@ -127,53 +410,126 @@ def install_nvda(installer_path):
     Returns:
         str: Path to the installed nvda.exe
     """
-    logging.info(f"Installing NVDA from {installer_path}")
+    logging.info("Installing NVDA from %s", installer_path)
     
     try:
         # Run installer silently
         cmd = [installer_path, "--install", "--silent"]
-        run_command(cmd)
+        await run_command_async(cmd)
         logging.info("NVDA installed successfully")
         
         # NVDA installs to Program Files (x86) by default
-        nvda_path = os.path.join(os.environ.get('ProgramFiles(x86)', 'C:\\Program Files (x86)'), 'NVDA', 'nvda.exe')
+        nvda_path = NVDA_EXE
         if not os.path.isfile(nvda_path):
             raise FileNotFoundError(f"NVDA executable not found at expected path: {nvda_path}")
             
-        logging.info(f"NVDA installed at: {nvda_path}")
+        logging.info("NVDA installed at: %s", nvda_path)
         
-        # Give NVDA time to start and then kill it
-        time.sleep(5)
-        run_command(['taskkill', '/f', '/im', 'nvda.exe'], shell=True, check=False)
+        # The installer starts NVDA by the time it exits, if at all; kill it
+        # as soon as it is up, using the processes found by the poll
+        procs = []
+        def nvda_started():
+            procs[:] = nvda_processes()
+            return procs
+        if await asyncio.to_thread(wait_until, nvda_started, NVDA_START_TIMEOUT):
+            await asyncio.to_thread(kill_nvda, procs)
+        else:
+            logging.info("NVDA did not start after installation")
         
         return nvda_path
         
     except Exception as e:
-        logging.error(f"Error installing NVDA: {str(e)}")
+        logging.error("Error installing NVDA: %s", e)
         raise
 
-def install_addon(addon_path):
+def copy_file(src, dst):
+    """Copy a file without passing its data through Python.
+    
+    On Windows the copy is done by CopyFile2, which also copies the file's
+    attributes and timestamps. Elsewhere shutil.copyfile copies the contents
+    only, using the kernel's copy fast path (sendfile on Linux, fcopyfile on
+    macOS).
+    
+    Args:
+        src (str): Source file path.
+        dst (str): Destination file path, overwritten if it exists.
+    """
+    if os.name == 'nt':
+        hr = _kernel32.CopyFile2(src, dst, None)
+        if hr < 0:
+            hr &= 0xFFFFFFFF
+            # HRESULT_FROM_WIN32 wraps a Win32 error code in FACILITY_WIN32;
+            # any other HRESULT is reported as is
+            if hr & 0xFFFF0000 == 0x80070000:
+                raise ctypes.WinError(hr & 0xFFFF)
+            raise ctypes.WinError(hr)
+        return
+    
+    shutil.copyfile(src, dst)
+
+def install_addon(addon_path, move=False):
     """Install the AT Automation addon.
     
     Args:
         addon_path (str): Path to the addon file.
+        move (bool): Move the file instead of copying it when it is on the
+            same volume as the addons directory. The source is consumed.
     """
-    logging.info(f"Installing addon from {addon_path}")
+    logging.info("Installing addon from %s", addon_path)
     
     try:
+        _require_appdata()
+        
         # Create addons directory if it doesn't exist
-        appdata = os.environ.get('APPDATA')
-        nvda_addons_dir = os.path.join(appdata, 'nvda', 'addons')
-        os.makedirs(nvda_addons_dir, exist_ok=True)
+        if not os.path.isdir(NVDA_ADDONS_DIR):
+            os.makedirs(NVDA_ADDONS_DIR, exist_ok=True)
         
-        # Copy the addon file to the addons directory
-        addon_dest = os.path.join(nvda_addons_dir, os.path.basename(addon_path))
-        shutil.copy2(addon_path, addon_dest)
+        # Copy the addon file to the addons directory, or rename it there
+        # when that only needs a directory entry update
+        addon_dest = os.path.join(NVDA_ADDONS_DIR, os.path.basename(addon_path))
+        same_volume = (
+            os.path.splitdrive(os.path.abspath(addon_path))[0].lower()
+            == os.path.splitdrive(addon_dest)[0].lower()
+        )
+        moved = False
+        if move and same_volume:
+            # A junction or redirected folder can still put the addons
+            # directory on another volume
+            try:
+                os.replace(addon_path, addon_dest)
+                moved = True
+            except OSError as e:
+                logging.info("Could not move addon, copying instead: %s", e)
+        if not moved:
+            copy_file(addon_path, addon_dest)
         
-        logging.info(f"Addon installed to {addon_dest}")
+        logging.info("Addon installed to %s", addon_dest)
         return True
     except Exception as e:
-        logging.error(f"Error installing addon: {str(e)}")
+        logging.error("Error installing addon: %s", e)
+        raise
+
+def write_nvda_config():
+    """Write the default NVDA configuration to the user's nvda.ini.
+    
+    NVDA must not be running, otherwise it overwrites the file on exit.
+    
+    Returns:
+        str: Path to the written nvda.ini
+    """
+    try:
+        _require_appdata()
+        if not os.path.isdir(NVDA_CONFIG_DIR):
+            os.makedirs(NVDA_CONFIG_DIR, exist_ok=True)
+        
+        ini_path = os.path.join(NVDA_CONFIG_DIR, 'nvda.ini')
+        with open(ini_path, 'wb') as f:
+            f.write(get_default_ini_bytes())
+        
+        logging.info("NVDA configuration written to %s", ini_path)
+        return ini_path
+    except Exception as e:
+        logging.error("Error writing NVDA configuration: %s", e)
         raise
 
 def find_nvda_exe():
@@ -182,131 +538,205 @@ def find_nvda_exe():
     Returns:
         str: Path to nvda.exe if found, otherwise raises an exception
     """
-    possible_paths = [
-        os.path.join(os.environ.get('ProgramFiles', 'C:\\Program Files'), 'NVDA', 'nvda.exe'),
-        os.path.join(os.environ.get('ProgramFiles(x86)', 'C:\\Program Files (x86)'), 'NVDA', 'nvda.exe'),
-        os.path.join('C:\\Program Files', 'NVDA', 'nvda.exe'),
-        os.path.join('C:\\Program Files (x86)', 'NVDA', 'nvda.exe'),
-    ]
-    
-    for path in possible_paths:
-        if os.path.isfile(path):
-            logging.info(f"Found NVDA executable at: {path}")
-            return path
+    path = next((p for p in NVDA_EXE_CANDIDATES if os.path.isfile(p)), None)
+    if path:
+        logging.info("Found NVDA executable at: %s", path)
+        return path
             
     # If we get here, we couldn't find NVDA
-    paths_checked = '\n'.join(f"- {p}" for p in possible_paths)
+    paths_checked = '\n'.join(f"- {p}" for p in NVDA_EXE_CANDIDATES)
     raise FileNotFoundError(f"Could not find nvda.exe. Checked the following paths:\n{paths_checked}")
 
-def create_portable_copy(version, nvda_path):
+def _discard_dir(path):
+    """Rename a directory out of the way and delete it on a background thread.
+    
+    The rename is immediate, so path can be recreated straight away.
+    """
+    trash_dir = f"{path}.trash-{uuid.uuid4().hex}"
+    logging.info("Discarding directory: %s", path)
+    os.replace(path, trash_dir)
+    threading.Thread(target=shutil.rmtree, args=(trash_dir,), kwargs={'ignore_errors': True}).start()
+
+def prepare_portable_dir(version):
+    """Create a fresh directory that will hold the portable copy.
+    
+    A directory left by an earlier run is discarded first; an nvda.exe
+    already in it would make wait_for_portable_copy finish before NVDA has
+    started copying.
+    
+    The userConfig subdirectories a portable NVDA keeps its configuration in
+    are created up front, so they are in place when the copy first runs.
+    
+    Args:
+        version (str): NVDA version for naming the portable copy.
+        
+    Returns:
+        str: Path to the portable directory
+    """
+    portable_path = os.path.join(os.getcwd(), f"nvda_{version}_portable")
+    if os.path.exists(portable_path):
+        _discard_dir(portable_path)
+    for subdir in PORTABLE_SUBDIRS:
+        os.makedirs(os.path.join(portable_path, subdir), exist_ok=True)
+    return portable_path
+
+async def create_portable_copy(version, nvda_path, kill_existing=True, portable_path=None):
     """Create a portable copy of NVDA.
     
     Args:
         version (str): NVDA version for naming the portable copy.
         nvda_path (str): Path to the installed NVDA executable.
+        kill_existing (bool): Kill running NVDA processes first. Callers that
+            have already stopped NVDA in this session can skip this.
+        portable_path (str, optional): Directory already created by
+            prepare_portable_dir. Created here if not given.
         
     Returns:
         dict: Result dictionary with success status and portable path
     """
-    logging.info(f"Creating portable copy for version {version}")
+    logging.info("Creating portable copy for version %s", version)
 
-    # Ensure administrator privileges – run_as_admin will fail if not
+    # Check the cheap preconditions before touching the filesystem or
+    # killing anything; the scheduled task needs administrator privileges
     if not is_admin():
-        error_msg = "Administrator privileges are required to create a portable copy. Please run this script as an administrator."
+        logging.error(ADMIN_REQUIRED_ERROR)
+        return {"success": False, "error": ADMIN_REQUIRED_ERROR}
+    if not os.path.isfile(nvda_path):
+        error_msg = f"NVDA executable not found: {nvda_path}"
         logging.error(error_msg)
-        raise Exception(error_msg)
+        return {"success": False, "error": error_msg}
     
     try:
-        # Create portable directory with version-specific name
-        portable_path = os.path.join(os.getcwd(), f"nvda_{version}_portable")
-        os.makedirs(portable_path, exist_ok=True)
-        
-        # Kill any existing NVDA processes
-        run_command(['taskkill', '/f', '/im', 'nvda.exe'], shell=True, check=False)
-        time.sleep(2)
+        # Create portable directory with version-specific name while killing
+        # any existing NVDA processes
+        pending = []
+        if portable_path is None:
+            pending.append(asyncio.to_thread(prepare_portable_dir, version))
+        if kill_existing:
+            pending.append(asyncio.to_thread(kill_nvda))
+        results = await asyncio.gather(*pending)
+        if portable_path is None:
+            portable_path = results[0]
         
         # Build the argument string for NVDA's portable mode.
         # Note: NVDA expects the portable directory via the --portable option.
         nvda_arguments = f'--portable="{portable_path}" --minimal'
-        logging.info(f"Launching NVDA elevated with arguments: {nvda_arguments}")
+        logging.info("Launching NVDA elevated with arguments: %s", nvda_arguments)
         
         # Launch the process elevated using scheduled tasks instead of direct elevation
         task_name = "NVDA_Portable_Task"
         # Schedule the task to start one minute from now
         start_time = (datetime.datetime.now() + datetime.timedelta(minutes=1)).strftime("%H:%M")
-        create_task_cmd = f'schtasks /Create /SC ONCE /TN {task_name} /TR "\"{nvda_path}\" {nvda_arguments}" /RL HIGHEST /ST {start_time} /F'
-        logging.info(f"Creating scheduled task with command: {create_task_cmd}")
-        run_command(create_task_cmd, shell=True)
-        task_name = "NVDA_Portable_Task"
-        # Schedule the task to start one minute from now
-        start_time = (datetime.datetime.now() + datetime.timedelta(minutes=1)).strftime("%H:%M")
         # Wrap the command with cmd /c so that the executable path with spaces is parsed correctly.
         tr_command = f'cmd /c ""{nvda_path}" {nvda_arguments}"'
         create_task_cmd = f'schtasks /Create /SC ONCE /TN {task_name} /TR "{tr_command}" /RL HIGHEST /ST {start_time} /F'
-        logging.info(f"Creating scheduled task with command: {create_task_cmd}")
-        run_command(create_task_cmd, shell=True)
+        logging.info("Creating scheduled task with command: %s", create_task_cmd)
+        await run_command_async(create_task_cmd, shell=True)
 
-        run_task_cmd = f'schtasks /Run /TN {task_name}'
-        logging.info(f"Running scheduled task with command: {run_task_cmd}")
-        run_command(run_task_cmd, shell=True)
+        run_task_cmd = ['schtasks', '/Run', '/TN', task_name]
+        logging.info("Running scheduled task with command: %s", run_task_cmd)
+        await run_command_async(run_task_cmd)
 
         # Optionally, delete the scheduled task
-        delete_task_cmd = f'schtasks /Delete /TN {task_name} /F'
-        logging.info(f"Deleting scheduled task with command: {delete_task_cmd}")
-        run_command(delete_task_cmd, shell=True)
-
-        # Wait for the portable copy to be created
-        time.sleep(10)
+        delete_task_cmd = ['schtasks', '/Delete', '/TN', task_name, '/F']
+        logging.info("Deleting scheduled task with command: %s", delete_task_cmd)
+        await run_command_async(delete_task_cmd)
 
-        # Verify the portable copy was created
-        if os.path.exists(os.path.join(portable_path, 'nvda.exe')):
-            logging.info(f"Portable copy created successfully at: {portable_path}")
-            
-            # Clean up any running NVDA processes
-            try:
-                run_command(['taskkill', '/f', '/im', 'nvda.exe'], shell=True, check=False)
-            except Exception:
-                pass
-                
+        # Wait for the portable copy to be completely written; killing NVDA
+        # before then leaves a truncated tree behind. The command line does
+        # not ask NVDA to copy the user configuration, so only nvda.exe is
+        # known to appear
+        required = ['nvda.exe']
+        completed = await asyncio.to_thread(
+            wait_for_portable_copy, portable_path, required, PORTABLE_COPY_TIMEOUT
+        )
+        
+        # Clean up any running NVDA processes
+        try:
+            await asyncio.to_thread(kill_nvda)
+        except Exception:
+            pass
+        
+        if completed:
+            logging.info("Portable copy created successfully at: %s", portable_path)
             return {"success": True, "portable_path": portable_path}
         
-        raise Exception("Portable copy was not created successfully")
+        raise Exception(f"Portable copy was not completed within {PORTABLE_COPY_TIMEOUT} seconds")
     except Exception as e:
         error_msg = f"Failed to create portable copy: {str(e)}"
         logging.error(error_msg)
         return {"success": False, "error": error_msg}
 
-def setup_nvda(installer_path, addon_path, version):
-    """Complete NVDA setup process: install, add addon, and create portable copy.
+async def setup_nvda_async(installer_path, addon_path, version, move_addon=False):
+    """Complete NVDA setup process: install, add addon, configure, and create portable copy.
+    
+    Steps without a dependency on each other run concurrently.
     
     Args:
         installer_path (str): Path to the NVDA installer
         addon_path (str): Path to the AT Automation addon
         version (str): NVDA version for naming the portable copy
+        move_addon (bool): Let install_addon move the addon file instead of
+            copying it
         
     Returns:
         dict: Result with success status and portable path
     """
     try:
-        logging.info(f"Starting NVDA setup with installer={installer_path}, addon={addon_path}, version={version}")
+        logging.info("Starting NVDA setup with installer=%s, addon=%s, version=%s", installer_path, addon_path, version)
         
-        # Step 1: Install NVDA and get its path
-        nvda_path = install_nvda(installer_path)
+        # Fail before installing or creating any directories if the portable
+        # copy cannot be made
+        if not is_admin():
+            raise Exception(ADMIN_REQUIRED_ERROR)
+        _require_appdata()
         
-        # Step 2: Install addon
-        install_addon(addon_path)
+        # Step 1: Install NVDA while the addon is copied and the portable
+        # directory is prepared; neither touches the installation directory
+        t_addon = asyncio.create_task(asyncio.to_thread(install_addon, addon_path, move_addon))
+        t_prep = asyncio.create_task(asyncio.to_thread(prepare_portable_dir, version))
+        try:
+            nvda_path = await install_nvda(installer_path)
+        except Exception:
+            await asyncio.gather(t_addon, t_prep, return_exceptions=True)
+            raise
         
-        # Step 3: Create portable copy
-        result = create_portable_copy(version, nvda_path)
+        # Step 2: Write NVDA settings. NVDA may have started after
+        # install_nvda stopped watching for it, and would overwrite nvda.ini
+        # on exit, so make sure it is not running
+        await asyncio.to_thread(kill_nvda)
+        t_config = asyncio.create_task(asyncio.to_thread(write_nvda_config))
+        _, _, portable_path = await asyncio.gather(t_addon, t_config, t_prep)
         
-        logging.info(f"NVDA setup completed: {result}")
+        # Step 3: Create portable copy (NVDA was stopped before step 2)
+        result = await create_portable_copy(
+            version, nvda_path,
+            kill_existing=False, portable_path=portable_path
+        )
+        
+        logging.info("NVDA setup completed: %s", result)
         return result
         
     except Exception as e:
         error_msg = str(e)
-        logging.error(f"NVDA setup failed: {error_msg}")
+        logging.error("NVDA setup failed: %s", error_msg)
         return {"success": False, "error": error_msg}
 
+def setup_nvda(installer_path, addon_path, version, move_addon=False):
+    """Run setup_nvda_async to completion from synchronous code.
+    
+    Args:
+        installer_path (str): Path to the NVDA installer
+        addon_path (str): Path to the AT Automation addon
+        version (str): NVDA version for naming the portable copy
+        move_addon (bool): Let install_addon move the addon file instead of
+            copying it
+        
+    Returns:
+        dict: Result with success status and portable path
+    """
+    return asyncio.run(setup_nvda_async(installer_path, addon_path, version, move_addon))
+
 if __name__ == "__main__":
     # This is now just for direct script usage/testing
     if len(sys.argv) < 4:
@@ -1,5 +1,6 @@
-def get_default_ini_content():
-    return """
+import textwrap
+
+_DEFAULT_INI = textwrap.dedent("""
     schemaVersion = 13
     [update]
       allowUsageStats = False
@@ -190,4 +191,11 @@ def get_default_ini_content():
       height = 500
       displays = "(1920, 1080)",
       autoPositionWindow = False
-      """
+      """).lstrip("\n")
+_DEFAULT_INI_BYTES = _DEFAULT_INI.encode('utf-8')
+
+def get_default_ini_content():
+    return _DEFAULT_INI
+
+def get_default_ini_bytes():
+    return _DEFAULT_INI_BYTES
@@ -5,9 +5,85 @@ Script to get the latest NVDA version from the official download directory.
 
 import requests
 import json
+import os
 import sys
 import re
-from bs4 import BeautifulSoup
+import tempfile
+import time
+
+RELEASES_URL = "https://download.nvaccess.org/releases/"
+
+# The directory listing is cached here and reused for LISTING_CACHE_TTL
+# seconds, after which it is revalidated with its ETag
+LISTING_CACHE_PATH = os.path.join(os.environ.get('RUNNER_TEMP', tempfile.gettempdir()), 'nvda_releases.html')
+LISTING_CACHE_TTL = 3600
+
+# Listing line for the stable symlink, e.g. "stable -> ././2024.4.2"
+_STABLE_RE = re.compile(r'stable\s+\\?->\s+\.?\.?/?\.?/?(\d+\.\d+\.\d+)')
+# Listing line for a release directory, e.g. "2024.4.2    ..."
+_VERSION_RE = re.compile(r'^(\d{4}\.\d+\.\d+)\s+')
+
+def _read_cached_listing():
+    """Return the cached listing, or None if it cannot be read."""
+    try:
+        with open(LISTING_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _write_cached_listing(text, etag):
+    """Store the listing and its ETag; a cache that cannot be written is skipped."""
+    etag_path = LISTING_CACHE_PATH + '.etag'
+    try:
+        with open(LISTING_CACHE_PATH, 'w', encoding='utf-8') as f:
+            f.write(text)
+        if etag:
+            with open(etag_path, 'w') as f:
+                f.write(etag)
+        elif os.path.isfile(etag_path):
+            os.remove(etag_path)
+    except OSError:
+        pass
+
+def get_release_listing():
+    """
+    Get the HTML of the NVDA releases directory listing, using the cached copy when possible.
+    
+    The cache is only an optimization: if it cannot be read or written, the
+    listing is fetched and returned as if there were no cache.
+    
+    Returns:
+        str: The directory listing HTML
+    """
+    headers = {}
+    try:
+        if os.path.getmtime(LISTING_CACHE_PATH) > time.time() - LISTING_CACHE_TTL:
+            listing = _read_cached_listing()
+            if listing is not None:
+                return listing
+        with open(LISTING_CACHE_PATH + '.etag', 'r') as f:
+            headers['If-None-Match'] = f.read().strip()
+    except OSError:
+        pass
+    
+    response = requests.get(RELEASES_URL, headers=headers)
+    if response.status_code == 304:
+        # Still current; restart the TTL and reuse the cached copy
+        listing = _read_cached_listing()
+        if listing is not None:
+            try:
+                os.utime(LISTING_CACHE_PATH)
+            except OSError:
+                pass
+            return listing
+        # The cached copy went away since the request was made
+        response = requests.get(RELEASES_URL)
+    if not response.ok:
+        # Don't cache error pages
+        return response.text
+    
+    _write_cached_listing(response.text, response.headers.get('ETag'))
+    return response.text
 
 def get_latest_nvda_version():
     """
@@ -16,30 +92,28 @@ def get_latest_nvda_version():
     Returns:
         str: The latest stable version (e.g., "2024.4.2")
     """
-    url = "https://download.nvaccess.org/releases/"
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    listing = get_release_listing()
     
     # Look for the stable symlink which points to the latest stable version
     # Format is typically: "stable -> ././2024.4.2"
     stable_entry = None
-    for line in response.text.splitlines():
+    for line in listing.splitlines():
         if "stable" in line and "->" in line:
             stable_entry = line
             break
     
     if stable_entry:
         # Extract the version from the symlink target
-        match = re.search(r'stable\s+\\?->\s+\.?\.?/?\.?/?(\d+\.\d+\.\d+)', stable_entry)
+        match = _STABLE_RE.search(stable_entry)
         if match:
             return match.group(1)
     
     # If we couldn't find the stable symlink, look for the most recent version
     # The directory listing is typically sorted with newest versions at the top
     versions = []
-    for line in response.text.splitlines():
+    for line in listing.splitlines():
         # Look for lines that start with a version number (YYYY.MM.DD)
-        match = re.match(r'^(\d{4}\.\d+\.\d+)\s+', line)
+        match = _VERSION_RE.match(line)
         if match and "beta" not in line and "rc" not in line:
             versions.append(match.group(1))
     
@@ -0,0 +1,37 @@
+"""
+Helpers for finding and killing running NVDA processes.
+"""
+
+import logging
+import psutil
+
+# Maximum number of seconds to wait for NVDA to exit after it is killed
+NVDA_EXIT_TIMEOUT = 10
+
+def nvda_processes():
+    """Return the running NVDA processes."""
+    return [
+        p for p in psutil.process_iter(['name'])
+        if p.info['name'] and p.info['name'].lower() == 'nvda.exe'
+    ]
+
+def kill_nvda(procs=None):
+    """Kill all running NVDA processes and wait until they are gone.
+
+    Args:
+        procs (list, optional): Processes already returned by nvda_processes().
+            The process list is scanned again if not given.
+    """
+    if procs is None:
+        procs = nvda_processes()
+    if not procs:
+        return
+    for proc in procs:
+        try:
+            proc.kill()
+        except psutil.Error as e:
+            logging.info("Could not kill NVDA process %s: %s", proc.pid, e)
+    gone, alive = psutil.wait_procs(procs, timeout=NVDA_EXIT_TIMEOUT)
+    logging.info("Killed %s NVDA process(es)", len(gone))
+    if alive:
+        logging.warning("nvda.exe still running %ss after kill: %s", NVDA_EXIT_TIMEOUT, [p.pid for p in alive])
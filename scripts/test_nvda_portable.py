@@ -6,10 +6,12 @@ Script to test the NVDA portable installation with AT Automation plugin.
 import os
 import sys
 import time
-import subprocess
 import json
 import socket
 import logging
+import psutil
+from pywinauto.application import Application
+from nvda_processes import kill_nvda
 
 # Set up logging to a file instead of stdout
 logging.basicConfig(
@@ -18,6 +20,46 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Maximum number of seconds to wait for NVDA to become idle after launch
+NVDA_START_TIMEOUT = 30
+
+# The AT Automation server is polled every PORT_POLL_INTERVAL seconds until
+# it accepts a connection or SERVER_START_TIMEOUT seconds have passed
+SERVER_PORT = 8765
+SERVER_START_TIMEOUT = 15
+PORT_POLL_INTERVAL = 0.2
+
+def _wait_for_server():
+    """Poll the AT Automation server port until it accepts a connection.
+    
+    Returns:
+        bool: True if the server accepted a connection before the timeout.
+    """
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', SERVER_PORT), timeout=PORT_POLL_INTERVAL).close()
+            return True
+        except OSError as e:
+            if time.monotonic() >= deadline:
+                logging.error(f"AT Automation server is not running! Last connection error: {e}")
+                return False
+        time.sleep(PORT_POLL_INTERVAL)
+
+def _stop_nvda(pid):
+    """Stop the NVDA process started by the test, then any stray nvda.exe."""
+    try:
+        proc = psutil.Process(pid)
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except psutil.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    except psutil.Error as e:
+        logging.info(f"Could not stop NVDA process {pid}: {e}")
+    kill_nvda()
+
 def test_nvda_portable(portable_path):
     """
     Test if the NVDA portable installation works with the AT Automation plugin.
@@ -34,42 +76,33 @@ def test_nvda_portable(portable_path):
     nvda_exe = os.path.join(portable_path, 'nvda.exe')
     logging.info(f"Starting NVDA from {nvda_exe} in minimal mode")
     
+    success = False
+    app = None
     try:
-        subprocess.Popen([nvda_exe, "-m"])  # -m for minimal mode
-        logging.info("Waiting for NVDA to start (15 seconds)")
-        time.sleep(15)  # Give NVDA time to start
+        # start() waits until NVDA has finished initialising and is idle
+        logging.info(f"Waiting up to {NVDA_START_TIMEOUT} seconds for NVDA to start")
+        app = Application(backend="uia").start(f'"{nvda_exe}" -m', timeout=NVDA_START_TIMEOUT)  # -m for minimal mode
         
         # Test if AT Automation server is running on port 8765
-        logging.info("Testing connection to AT Automation server on port 8765")
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            result = sock.connect_ex(('127.0.0.1', 8765))
-            sock.close()
-            
-            if result == 0:
-                logging.info("AT Automation server is running!")
-                success = True
-            else:
-                logging.error(f"AT Automation server is not running! Connection result: {result}")
-                success = False
-        except Exception as e:
-            logging.error(f"Error testing connection: {str(e)}")
-            success = False
-        
-        # Kill NVDA
-        logging.info("Killing NVDA process")
-        os.system('taskkill /f /im nvda.exe')
-        time.sleep(2)
-        
-        return success
+        logging.info(f"Waiting up to {SERVER_START_TIMEOUT} seconds for the AT Automation server on port {SERVER_PORT}")
+        success = _wait_for_server()
+        if success:
+            logging.info("AT Automation server is running!")
     except Exception as e:
         logging.error(f"Error during test: {str(e)}")
-        # Make sure NVDA is killed even if there's an error
+    finally:
+        # The result is already decided; a failed cleanup is only logged
         try:
-            os.system('taskkill /f /im nvda.exe')
-        except:
-            pass
-        return False
+            if app is not None:
+                # Stop NVDA through the process handle we started it with
+                logging.info(f"Stopping NVDA process {app.process}")
+                _stop_nvda(app.process)
+            else:
+                kill_nvda()
+        except Exception as e:
+            logging.warning(f"Error stopping NVDA: {str(e)}")
+    
+    return success
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
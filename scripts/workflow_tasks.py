@@ -5,17 +5,81 @@ Centralized module for GitHub Actions workflow tasks.
 
 import os
 import sys
-import json
 import shutil
+import subprocess
+import tempfile
+import time
 import zipfile
 import requests
 
+# Buffer size used when streaming downloads to disk and files into archives
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# The installer is only needed until NVDA is installed, so it is kept on the
+# runner's local temp disk rather than in the workspace
+INSTALLER_PATH = os.path.join(os.environ.get('RUNNER_TEMP', tempfile.gettempdir()), 'nvda_installer.exe')
+
 def setup_python_path():
     """Add the workspace root to Python path."""
     workspace_dir = os.getcwd()
     if workspace_dir not in sys.path:
         sys.path.insert(0, workspace_dir)
 
+def _iter_tree(root):
+    """Yield a DirEntry for every directory and regular file under root, using os.scandir.
+    
+    Symlinks to directories are skipped rather than followed or archived.
+    
+    Args:
+        root (str): Directory to walk.
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    yield entry
+                elif entry.is_file():
+                    yield entry
+
+def _zip_tree(zipf, root):
+    """Add every directory and file under root to an open ZipFile, named relative to root.
+    
+    Directories get their own entries, as they do in archives made by 7-Zip,
+    so empty directories are kept. Files are copied into the archive with a
+    large buffer rather than the small fixed one ZipFile.write uses, and each
+    entry is built from the DirEntry's stat result instead of statting the
+    file again.
+    
+    Args:
+        zipf (zipfile.ZipFile): Archive opened for writing.
+        root (str): Directory whose contents are added.
+    """
+    for entry in _iter_tree(root):
+        st = entry.stat()
+        name = os.path.relpath(entry.path, root)
+        if entry.is_dir(follow_symlinks=False):
+            zinfo = zipfile.ZipInfo(name + '/', time.localtime(st.st_mtime)[:6])
+            zinfo.external_attr = (st.st_mode & 0xFFFF) << 16 | 0x10  # MS-DOS directory flag
+            zipf.writestr(zinfo, b'')
+            continue
+        zinfo = zipfile.ZipInfo(name, time.localtime(st.st_mtime)[:6])
+        zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+        zinfo.file_size = st.st_size
+        zinfo.compress_type = zipf.compression
+        with open(entry.path, 'rb') as src, zipf.open(zinfo, 'w') as dst:
+            shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_SIZE)
+
+def _emit_env(pairs):
+    """Append environment variables for later workflow steps to GITHUB_ENV.
+    
+    Args:
+        pairs (dict): Variable names mapped to their values, written in a single call.
+    """
+    with open(os.environ['GITHUB_ENV'], 'a') as f:
+        f.write(''.join(f"{key}={value}\n" for key, value in pairs.items()))
+
 def get_nvda_info(version=None):
     """Get NVDA version and download URL.
     
@@ -39,9 +103,10 @@ def get_nvda_info(version=None):
         }
         
         # Set environment variables
-        with open(os.environ['GITHUB_ENV'], 'a') as f:
-            f.write(f"NVDA_VERSION={nvda_info['version']}\n")
-            f.write(f"NVDA_DOWNLOAD_URL={nvda_info['url']}\n")
+        _emit_env({
+            'NVDA_VERSION': nvda_info['version'],
+            'NVDA_DOWNLOAD_URL': nvda_info['url'],
+        })
         
         print(f"NVDA version: {nvda_info['version']}")
         print(f"NVDA download URL: {nvda_info['url']}")
@@ -60,17 +125,23 @@ def download_nvda_installer():
     """
     try:
         print(f"Downloading from: {os.environ['NVDA_DOWNLOAD_URL']}")
-        response = requests.get(os.environ['NVDA_DOWNLOAD_URL'])
-        response.raise_for_status()
+        installer_path = INSTALLER_PATH
         
-        installer_path = 'nvda_installer.exe'
-        with open(installer_path, 'wb') as f:
-            f.write(response.content)
+        # Stream the installer straight to disk instead of holding it in memory
+        with requests.get(os.environ['NVDA_DOWNLOAD_URL'], stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            with open(installer_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+                f.flush()
+                size = os.fstat(f.fileno()).st_size
         
-        if not os.path.exists(installer_path) or os.path.getsize(installer_path) == 0:
+        if size == 0:
             raise Exception("Downloaded file is empty or does not exist")
         
-        print(f"NVDA installer downloaded successfully: {os.path.getsize(installer_path)} bytes")
+        print(f"NVDA installer downloaded successfully: {size} bytes")
+        
+        _emit_env({'INSTALLER_PATH': installer_path})
         return {"success": True, "installer_path": installer_path}
     except Exception as e:
         error_msg = f"Failed to download NVDA installer: {str(e)}"
@@ -93,8 +164,7 @@ def get_nvda_plugin():
         
         print(f"Plugin downloaded successfully to: {result['plugin_dir']}")
         
-        with open(os.environ['GITHUB_ENV'], 'a') as f:
-            f.write(f"PLUGIN_DIR={result['plugin_dir']}\n")
+        _emit_env({'PLUGIN_DIR': result['plugin_dir']})
             
         return result
     except Exception as e:
@@ -113,13 +183,10 @@ def create_plugin_addon():
         os.chdir('NVDAPlugin')
         addon_path = '../at-automation.nvda-addon'
         
-        # Create the addon zip file directly from the contents
-        with zipfile.ZipFile(addon_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk('.'):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    archive_path = os.path.relpath(file_path, '.')
-                    zipf.write(file_path, archive_path)
+        # Create the addon zip file directly from the contents. NVDA unpacks
+        # the addon on install, so the entries are stored uncompressed.
+        with zipfile.ZipFile(addon_path, 'w', zipfile.ZIP_STORED) as zipf:
+            _zip_tree(zipf, '.')
         
         print("AT Automation addon created successfully")
         return {"success": True, "addon_path": os.path.abspath(addon_path)}
@@ -128,9 +195,13 @@ def create_plugin_addon():
         print(error_msg, file=sys.stderr)
         return {"success": False, "error": error_msg}
 
-def configure_nvda():
+def configure_nvda(installer_path=None):
     """Configure NVDA and create portable copy.
     
+    Args:
+        installer_path (str, optional): Path returned by download_nvda_installer.
+            Defaults to INSTALLER_PATH.
+        
     Returns:
         dict: Result with success status and portable path
     """
@@ -139,20 +210,21 @@ def configure_nvda():
 
     try:
         # Get the required paths from environment
-        installer_path = 'nvda_installer.exe'  # This was downloaded earlier
+        installer_path = installer_path or INSTALLER_PATH  # This was downloaded earlier
         addon_path = 'at-automation.nvda-addon'  # This was created earlier
         version = os.environ['NVDA_VERSION']
         
-        # Run the full configuration process
+        # Run the full configuration process. The addon file is not needed
+        # after this step, so it may be moved rather than copied.
         result = configure_nvda.setup_nvda(
             installer_path=installer_path,
             addon_path=addon_path,
-            version=version
+            version=version,
+            move_addon=True
         )
         
         if result['success'] and 'portable_path' in result:
-            with open(os.environ['GITHUB_ENV'], 'a') as f:
-                f.write(f"PORTABLE_PATH={result['portable_path']}\n")
+            _emit_env({'PORTABLE_PATH': result['portable_path']})
                 
         return result
             
@@ -192,15 +264,21 @@ def package_nvda():
         zip_path = f"{os.environ['NVDA_VERSION']}.zip"
         portable_path = os.environ['PORTABLE_PATH']
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(portable_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, portable_path)
-                    zipf.write(file_path, arcname)
+        # 7-Zip (preinstalled on the Windows runners) deflates on all cores;
+        # fall back to zipfile where it is not available
+        seven_zip = shutil.which('7z')
+        if seven_zip:
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+            subprocess.run(
+                [seven_zip, 'a', '-tzip', '-mmt=on', '-mx=5', os.path.abspath(zip_path), '.'],
+                cwd=portable_path, check=True, stdout=subprocess.DEVNULL
+            )
+        else:
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                _zip_tree(zipf, portable_path)
         
-        with open(os.environ['GITHUB_ENV'], 'a') as f:
-            f.write(f"ZIP_PATH={zip_path}\n")
+        _emit_env({'ZIP_PATH': zip_path})
         
         print(f"NVDA portable packaged successfully: {zip_path}")
         return {"success": True, "zip_path": zip_path}
@@ -222,7 +300,7 @@ if __name__ == "__main__":
         'download_nvda_installer': download_nvda_installer,
         'get_nvda_plugin': get_nvda_plugin,
         'create_plugin_addon': create_plugin_addon,
-        'configure_nvda': configure_nvda,
+        'configure_nvda': lambda: configure_nvda(args[0] if args else None),
         'test_nvda': test_nvda,
         'package_nvda': package_nvda,
     }